@@ -6,6 +6,7 @@ import random
 import logging
 import requests
 import importlib
+from itertools import islice
 from datetime import date
 from PIL import Image
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -16,6 +17,16 @@ import musicbrainzngs
 from duckduckgo_search import DDGS
 from bs4 import BeautifulSoup
 
+from facets import (
+    FACET_FIELDS,
+    build_facet_index,
+    build_query_clauses,
+    build_selections,
+    get_facet_counts,
+    get_format_suffixes,
+    select_positions,
+)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -33,6 +44,12 @@ SOFTWARE_EXTENSIONS = ('.exe', '.msi', '.dmg', '.zip', '.tar', '.gz', '.bin', '.
 
 DEFAULT_THUMBNAIL = "placeholder.png"
 DEFAULT_SELECT_OPTION = "Select an option"
+FACET_ALL_OPTION = "All"
+
+SEARCH_RESULT_LIMIT = 1000
+# Sorted so the rows kept under SEARCH_RESULT_LIMIT are the most downloaded, and stay the same between runs.
+SEARCH_SORTS = ['downloads desc', 'identifier asc']
+SEARCH_FIELDS = ['identifier', 'title', 'creator', 'image', 'mediatype', 'date', 'year', 'format', 'downloads']
 
 musicbrainzngs.set_useragent("ArchiveOrgSearch", "1.0", "your_email@example.com")
 
@@ -65,19 +82,20 @@ def retry_with_backoff(func, args=(), max_retries=MAX_RETRIES, initial_delay=1):
             return None
 
 @st.cache_data(ttl=3600)
-def search_archive(search_term, media_type, start_year=None):
+def search_archive(search_term, media_type, clauses=()):
     try:
         ia = internetarchive.ArchiveSession()
         query = f'({search_term}) AND mediatype:{media_type}'
-        if start_year:
-            query += f' AND date:[{start_year}-01-01 TO {start_year}-12-31]'
+        for clause in clauses:
+            query += f' AND {clause}'
 
-        search_results = ia.search_items(query=query, fields=['identifier', 'title', 'creator', 'image', 'mediatype'])
-        results_list = [dict(result) for result in search_results]
-        return results_list
+        search_results = ia.search_items(query=query, fields=SEARCH_FIELDS, sorts=SEARCH_SORTS)
+        results_list = [dict(result) for result in islice(search_results, SEARCH_RESULT_LIMIT + 1)]
+        truncated = len(results_list) > SEARCH_RESULT_LIMIT
+        return results_list[:SEARCH_RESULT_LIMIT], truncated
     except Exception as e:
         st.error(f"Error during search: {e}")
-        return []
+        return [], False
 
 @st.cache_data(ttl=3600)
 def search_archive_with_duckduckgo(search_term, media_type, start_year=None, max_results=60, max_retries=5, use_proxy=False):
@@ -125,6 +143,9 @@ def search_archive_with_duckduckgo(search_term, media_type, start_year=None, max
                     'creator': metadata.get('creator', ''),
                     'image': f"https://archive.org/services/img/{identifier}",
                     'mediatype': metadata.get('mediatype', ''),
+                    'date': metadata.get('date', ''),
+                    'year': metadata.get('year', ''),
+                    'format': sorted({file['format'] for file in item.files if file.get('format')}),
                     'source': 'duckduckgo'
                 }
         except Exception as e:
@@ -181,6 +202,74 @@ def filter_results_by_file_types(results, file_types_str):
                 filtered.append(next(res for res in results if res['identifier'] == identifier))
     return filtered
 
+def refine_search_results(results, facet_index, start_year=None, file_types_str="", facet_selections=None):
+    selections = build_selections(facet_index, start_year, file_types_str, facet_selections)
+    positions = select_positions(facet_index, range(len(results)), selections)
+
+    if file_types_str and get_format_suffixes(file_types_str) is None:
+        candidates = [results[position] for position in sorted(positions)]
+        matched_ids = {res['identifier'] for res in filter_results_by_file_types(candidates, file_types_str)}
+        positions = {position for position in positions if results[position]['identifier'] in matched_ids}
+    return positions
+
+def load_search_results(search_term, media_type, clauses, use_ddg_search, use_proxy):
+    with st.spinner(f"Searching Archive.org for '{search_term}'..."):
+        ia_results, truncated = search_archive(search_term, media_type, clauses=clauses)
+        ia_results = [dict(result, source='archive_api') for result in ia_results]
+        st.session_state.ia_results = ia_results
+
+    if not use_ddg_search:
+        st.info("DuckDuckGo search is disabled via sidebar toggle.")
+        return ia_results, truncated
+
+    with st.spinner(f"Searching DuckDuckGo for '{search_term}'..."):
+        ddg_results = search_archive_with_duckduckgo(
+            search_term,
+            media_type,
+            use_proxy=use_proxy
+        )
+    existing_ids = {item['identifier'] for item in ia_results}
+    combined_results = ia_results.copy()
+    combined_results.extend([item for item in ddg_results if item['identifier'] not in existing_ids])
+    return combined_results, truncated
+
+def display_facet_filters(facet_index, positions):
+    # Selections live in session state rather than widget keys: Streamlit derives a widget's
+    # id from its options and labels, which change with the counts, and would reset the pick.
+    current_selections = st.session_state.facet_selections
+    selections = {facet: {value} for facet, value in current_selections.items() if value}
+    with st.expander("Refine Results", expanded=bool(selections)):
+        if st.session_state.results_truncated:
+            st.caption(
+                f"Counts cover only the first {SEARCH_RESULT_LIMIT} Archive.org results; "
+                "picking a value searches Archive.org again."
+            )
+        cols = st.columns(len(FACET_FIELDS))
+        for col, facet in zip(cols, FACET_FIELDS):
+            current = current_selections.get(facet)
+            counts = dict(get_facet_counts(
+                facet_index,
+                select_positions(facet_index, positions, selections, exclude=facet),
+                facet
+            ))
+            options = [FACET_ALL_OPTION] + list(counts)
+            if current and current not in counts:
+                options.append(current)
+            with col:
+                selected = st.selectbox(
+                    f"{facet.capitalize()}:",
+                    options=options,
+                    index=options.index(current) if current else 0,
+                    format_func=lambda value, lookup=counts: (
+                        value if value == FACET_ALL_OPTION else f"{value} ({lookup.get(value, 0)})"
+                    )
+                )
+            selected = None if selected == FACET_ALL_OPTION else selected
+            if selected != current:
+                st.session_state.facet_selections = dict(current_selections, **{facet: selected})
+                st.experimental_rerun()
+    return selections
+
 def download_file(url, filename):
     try:
         response = requests.get(url, stream=True)
@@ -277,6 +366,8 @@ def display_result_details(result, media_type):
 
         if result.get('creator'):
             st.write(f"**Creator:** {result['creator']}")
+        if result.get('downloads'):
+            st.write(f"**Downloads:** {result['downloads']}")
         st.write(f"**Identifier:** {result['identifier']}")
         st.markdown(f"[View on Archive.org](https://archive.org/details/{result['identifier']})")
 
@@ -329,7 +420,15 @@ def main():
         'results': [],
         'filtered_results': [],
         'selected_media_type': "audio",
-        'file_types_filter': ""
+        'file_types_filter': "",
+        'start_year': None,
+        'search_key': None,
+        'results_truncated': False,
+        'results_clauses': (),
+        'facet_index': build_facet_index([]),
+        'query_positions': set(),
+        'facet_selections': {},
+        'filtered_truncated': False
     }
     for key, default in session_defaults.items():
         if key not in st.session_state:
@@ -428,37 +527,71 @@ def main():
         st.session_state.file_types_filter = file_types_filter
         st.session_state.start_year = start_year
 
-        with st.spinner(f"Searching Archive.org for '{search_term}'..."):
-            ia_results = search_archive(search_term, selected_media_type, start_year=start_year)
-            for result in ia_results:
-                result['source'] = 'archive_api'
-            st.session_state.ia_results = ia_results
-
-        if st.session_state.use_ddg_search:
-            with st.spinner(f"Searching DuckDuckGo for '{search_term}'..."):
-                ddg_results = search_archive_with_duckduckgo(
-                    search_term,
-                    selected_media_type,
-                    start_year=start_year,
-                    use_proxy=use_proxy_ddg
-                )
-                existing_ids = {item['identifier'] for item in ia_results}
-                combined_results = ia_results.copy()
-                combined_results.extend([item for item in ddg_results if item['identifier'] not in existing_ids])
-                st.session_state.results = combined_results
+        # Year and file type refinements are answered from the facet index when the loaded
+        # results are complete and at least as broad as the new filters; otherwise the
+        # filters are sent to archive.org with the query.
+        search_key = (search_term, selected_media_type, st.session_state.use_ddg_search)
+        clauses = build_query_clauses(start_year, file_types_filter)
+        loaded_clauses = set(st.session_state.results_clauses)
+        if search_key != st.session_state.search_key or (
+            loaded_clauses != set(clauses)
+            and (st.session_state.results_truncated or not loaded_clauses <= set(clauses))
+        ):
+            results, truncated = load_search_results(
+                search_term, selected_media_type, clauses, st.session_state.use_ddg_search, use_proxy_ddg
+            )
+            st.session_state.results = results
+            st.session_state.results_truncated = truncated
+            st.session_state.results_clauses = clauses
+            st.session_state.search_key = search_key
+            st.session_state.facet_index = build_facet_index(results)
+            st.session_state.facet_selections = {}
+
+        st.session_state.query_positions = refine_search_results(
+            st.session_state.results,
+            st.session_state.facet_index,
+            start_year=start_year,
+            file_types_str=file_types_filter
+        )
 
-                if file_types_filter:
-                    filtered = filter_results_by_file_types(combined_results, file_types_filter)
-                else:
-                    filtered = combined_results
-                st.session_state.filtered_results = filtered
+    if st.session_state.results:
+        facet_selections = display_facet_filters(st.session_state.facet_index, st.session_state.query_positions)
+        if facet_selections and st.session_state.results_truncated:
+            # Facet picks over a truncated set would miss matches past the limit.
+            loaded_term, loaded_media_type, loaded_use_ddg = st.session_state.search_key
+            view_results, view_truncated = load_search_results(
+                loaded_term,
+                loaded_media_type,
+                st.session_state.results_clauses + build_query_clauses(facet_selections=facet_selections),
+                loaded_use_ddg,
+                use_proxy_ddg
+            )
+            positions = refine_search_results(
+                view_results,
+                build_facet_index(view_results),
+                start_year=st.session_state.start_year,
+                file_types_str=st.session_state.file_types_filter,
+                facet_selections=facet_selections
+            )
         else:
-            st.info("DuckDuckGo search is disabled via sidebar toggle.")
-            st.session_state.results = st.session_state.ia_results
-            st.session_state.filtered_results = st.session_state.ia_results
+            view_results, view_truncated = st.session_state.results, st.session_state.results_truncated
+            positions = select_positions(
+                st.session_state.facet_index, st.session_state.query_positions, facet_selections
+            )
+        st.session_state.filtered_results = [view_results[position] for position in sorted(positions)]
+        st.session_state.filtered_truncated = view_truncated
+    else:
+        st.session_state.filtered_results = []
+        st.session_state.filtered_truncated = False
 
     if st.session_state.filtered_results:
         st.subheader("Search Results")
+        if st.session_state.filtered_truncated:
+            st.warning(
+                f"Archive.org has more than {SEARCH_RESULT_LIMIT} matches for this search and only the first "
+                f"{SEARCH_RESULT_LIMIT} were loaded, so these results are incomplete. "
+                "Add a year, file type or facet filter to narrow the search."
+            )
         num_columns = 5
         cols = st.columns(num_columns)
 
@@ -0,0 +1,115 @@
+# facets.py
+"""In-memory facet indexes over archive.org search results."""
+
+FACET_FIELDS = ('year', 'creator', 'format')
+
+# Archive.org format names end with these suffixes (e.g. "VBR MP3", "24bit Flac",
+# "Text PDF"), so these file types can be matched against the format facet locally
+# and with a format:(...) clause on the server.
+FORMAT_FILE_TYPES = {
+    'mp3': 'MP3',
+    'flac': 'Flac',
+    'pdf': 'PDF',
+    'wav': 'WAVE',
+    'ogg': 'Ogg Vorbis',
+    'zip': 'ZIP',
+}
+
+def get_facet_values(result, facet):
+    """Returns the normalized values of a facet for one search result."""
+    if facet == 'year':
+        for field in ('date', 'year'):
+            value = str(result.get(field) or '')[:4]
+            if value.isdigit():
+                return [value]
+        return []
+    values = result.get(facet) or []
+    if isinstance(values, str):
+        values = [values]
+    return [str(value).strip() for value in values if str(value).strip()]
+
+def build_facet_index(results):
+    """Maps each facet value to the set of result positions that carry it."""
+    facet_index = {facet: {} for facet in FACET_FIELDS}
+    for position, result in enumerate(results):
+        for facet in FACET_FIELDS:
+            for value in get_facet_values(result, facet):
+                facet_index[facet].setdefault(value, set()).add(position)
+    return facet_index
+
+def select_positions(facet_index, positions, selections, exclude=None):
+    """Narrows positions to results matching any selected value of every selected facet."""
+    selected = set(positions)
+    for facet, values in selections.items():
+        if facet == exclude or values is None:
+            continue
+        matched = set()
+        for value in values:
+            matched |= facet_index[facet].get(value, set())
+        selected &= matched
+    return selected
+
+def get_facet_counts(facet_index, positions, facet):
+    """Returns (value, count) pairs over positions, most frequent first."""
+    counts = {value: len(ids & positions) for value, ids in facet_index[facet].items()}
+    return sorted(
+        ((value, count) for value, count in counts.items() if count),
+        key=lambda item: (-item[1], item[0])
+    )
+
+def get_format_suffixes(file_types_str):
+    """Returns the format suffixes for the file types, or None if any type has no known format."""
+    file_types = set(ft.lower() for ft in file_types_str.split())
+    if not file_types or not file_types.issubset(FORMAT_FILE_TYPES):
+        return None
+    return tuple(sorted(FORMAT_FILE_TYPES[ft] for ft in file_types))
+
+def get_file_type_formats(facet_index, file_types_str):
+    """Returns the indexed format values matching the file types, or None if they can't be matched locally."""
+    suffixes = get_format_suffixes(file_types_str)
+    if suffixes is None:
+        return None
+    lowered = tuple(suffix.lower() for suffix in suffixes)
+    return {fmt for fmt in facet_index['format'] if fmt.lower().endswith(lowered)}
+
+def build_selections(facet_index, start_year=None, file_types_str="", facet_selections=None):
+    """Combines the year, file type and facet picks into selections for select_positions."""
+    selections = {'year': {str(start_year)} if start_year else None}
+    if file_types_str:
+        selections['format'] = get_file_type_formats(facet_index, file_types_str)
+    for facet, values in (facet_selections or {}).items():
+        if values is None:
+            continue
+        if selections.get(facet) is None:
+            selections[facet] = set(values)
+        else:
+            selections[facet] = selections[facet] & set(values)
+    return selections
+
+def _quote(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def _year_clause(years):
+    # Mirrors get_facet_values: an item's year comes from date, and from year only when
+    # date is missing.
+    years = sorted(str(year) for year in years)
+    dates = ' OR '.join(f'[{year}-01-01 TO {year}-12-31]' for year in years)
+    return f'(date:({dates}) OR (year:({" OR ".join(years)}) AND NOT date:[* TO *]))'
+
+def build_query_clauses(start_year=None, file_types_str="", facet_selections=None):
+    """Builds archive.org query clauses for the refinements the server can answer."""
+    clauses = []
+    if start_year:
+        clauses.append(_year_clause([start_year]))
+    suffixes = get_format_suffixes(file_types_str) if file_types_str else None
+    if suffixes:
+        patterns = ' OR '.join('*' + suffix.replace(' ', '\\ ') for suffix in suffixes)
+        clauses.append(f'format:({patterns})')
+    for facet, values in sorted((facet_selections or {}).items()):
+        if not values:
+            continue
+        if facet == 'year':
+            clauses.append(_year_clause(values))
+        else:
+            clauses.append(f'{facet}:(' + ' OR '.join(_quote(value) for value in sorted(values)) + ')')
+    return tuple(clauses)
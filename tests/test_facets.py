@@ -0,0 +1,94 @@
+from facets import (
+    build_facet_index,
+    build_query_clauses,
+    build_selections,
+    get_facet_counts,
+    get_facet_values,
+    get_file_type_formats,
+    get_format_suffixes,
+    select_positions,
+)
+
+RESULTS = [
+    {'identifier': 'a', 'date': '1990-05-01T00:00:00Z', 'creator': ['X', 'Y'], 'format': ['VBR MP3', 'Flac FingerPrint']},
+    {'identifier': 'b', 'date': '', 'year': '1991', 'creator': 'X', 'format': ['24bit Flac']},
+    {'identifier': 'c', 'date': '1990', 'creator': 'Z', 'format': ['Ogg Vorbis', 'Text PDF']},
+    {'identifier': 'd', 'format': 'ZIP'},
+]
+
+def test_year_falls_back_from_date_to_year():
+    assert get_facet_values(RESULTS[0], 'year') == ['1990']
+    assert get_facet_values(RESULTS[1], 'year') == ['1991']
+    assert get_facet_values(RESULTS[3], 'year') == []
+
+def test_string_values_are_treated_as_single_values():
+    assert get_facet_values(RESULTS[1], 'creator') == ['X']
+    assert get_facet_values(RESULTS[3], 'format') == ['ZIP']
+    assert get_facet_values({'creator': ['', ' ']}, 'creator') == []
+
+def test_build_facet_index():
+    facet_index = build_facet_index(RESULTS)
+    assert facet_index['year'] == {'1990': {0, 2}, '1991': {1}}
+    assert facet_index['creator'] == {'X': {0, 1}, 'Y': {0}, 'Z': {2}}
+    assert facet_index['format']['ZIP'] == {3}
+
+def test_select_positions():
+    facet_index = build_facet_index(RESULTS)
+    all_positions = range(len(RESULTS))
+    assert select_positions(facet_index, all_positions, {}) == {0, 1, 2, 3}
+    assert select_positions(facet_index, all_positions, {'year': {'1990'}, 'creator': None}) == {0, 2}
+    assert select_positions(facet_index, all_positions, {'year': {'1990'}, 'creator': {'X'}}) == {0}
+    assert select_positions(facet_index, all_positions, {'year': {'1990', '1991'}}) == {0, 1, 2}
+    assert select_positions(facet_index, all_positions, {'year': {'2000'}}) == set()
+    assert select_positions(facet_index, {1, 2}, {'creator': {'X'}}) == {1}
+
+def test_facet_counts_apply_other_facets_only():
+    facet_index = build_facet_index(RESULTS)
+    selections = {'year': {'1990'}, 'creator': {'X'}}
+    creator_positions = select_positions(facet_index, range(len(RESULTS)), selections, exclude='creator')
+    assert get_facet_counts(facet_index, creator_positions, 'creator') == [('X', 1), ('Y', 1), ('Z', 1)]
+    year_positions = select_positions(facet_index, range(len(RESULTS)), selections, exclude='year')
+    assert get_facet_counts(facet_index, year_positions, 'year') == [('1990', 1), ('1991', 1)]
+
+def test_file_type_formats_match_format_suffixes():
+    facet_index = build_facet_index(RESULTS)
+    assert get_file_type_formats(facet_index, 'flac') == {'24bit Flac'}
+    assert get_file_type_formats(facet_index, 'ogg') == {'Ogg Vorbis'}
+    assert get_file_type_formats(facet_index, 'mp3') == {'VBR MP3'}
+    assert get_file_type_formats(facet_index, 'pdf zip') == {'Text PDF', 'ZIP'}
+    assert get_file_type_formats(facet_index, 'wav') == set()
+
+def test_file_types_without_known_format_are_not_matched_locally():
+    facet_index = build_facet_index(RESULTS)
+    assert get_format_suffixes('exe') is None
+    assert get_format_suffixes('mp3 exe') is None
+    assert get_file_type_formats(facet_index, 'deb') is None
+
+def test_build_selections_intersects_file_type_and_format_pick():
+    facet_index = build_facet_index(RESULTS)
+    selections = build_selections(facet_index, 1990, 'flac', {'format': {'24bit Flac'}, 'creator': {'X'}})
+    assert selections == {'year': {'1990'}, 'format': {'24bit Flac'}, 'creator': {'X'}}
+    assert select_positions(facet_index, range(len(RESULTS)), selections) == set()
+
+def test_build_query_clauses():
+    assert build_query_clauses() == ()
+    assert build_query_clauses(1990, 'exe') == (
+        '(date:([1990-01-01 TO 1990-12-31]) OR (year:(1990) AND NOT date:[* TO *]))',
+    )
+    assert build_query_clauses(file_types_str='ogg mp3') == (r'format:(*MP3 OR *Ogg\ Vorbis)',)
+    assert build_query_clauses(facet_selections={'creator': {'The "Band"'}, 'format': None}) == (
+        'creator:("The \\"Band\\"")',
+    )
+    assert build_query_clauses(facet_selections={'year': {'1991', '1990'}}) == (
+        '(date:([1990-01-01 TO 1990-12-31] OR [1991-01-01 TO 1991-12-31])'
+        ' OR (year:(1990 OR 1991) AND NOT date:[* TO *]))',
+    )
+
+def test_year_clause_matches_local_year_fallback():
+    results = [{'date': '', 'year': '1991'}, {'date': '1991-03-01T00:00:00Z'}, {'date': '1990-01-01', 'year': '1991'}]
+    facet_index = build_facet_index(results)
+    selections = build_selections(facet_index, 1991, '')
+    assert select_positions(facet_index, range(len(results)), selections) == {0, 1}
+    for clause in (build_query_clauses(1991)[0], build_query_clauses(facet_selections={'year': {'1991'}})[0]):
+        assert 'date:([1991-01-01 TO 1991-12-31])' in clause
+        assert 'year:(1991) AND NOT date:[* TO *]' in clause